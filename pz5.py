@@ -1,303 +1,579 @@
-# file: off_gui.py
-import sys
-import requests
-
-from PyQt6.QtWidgets import (
-    QApplication,
-    QWidget,
-    QVBoxLayout,
-    QHBoxLayout,
-    QLabel,
-    QLineEdit,
-    QPushButton,
-    QComboBox,
-    QTableWidget,
-    QTableWidgetItem,
-    QTextEdit,
-    QMessageBox,
-)
-
-BASE = "https://world.openfoodfacts.org"
-
-HEADERS = {
-    "User-Agent": "Darcons-Trade-CalorieFetcher/1.0 (+https://darcons-trade.example)"
-}
-
-
-def get_product_by_barcode(barcode: str, fields=None, lang="ru", country="ru") -> dict:
-    """
-    Получение конкретного продукта по штрихкоду (API v2).
-    """
-    if fields is None:
-        fields = "code,product_name,nutriments,brands,quantity,serving_size,language,lang,lc"
-
-    url = f"{BASE}/api/v2/product/{barcode}"
-    params = {"fields": fields, "lc": lang, "cc": country}
-
-    r = requests.get(url, headers=HEADERS, params=params, timeout=20)
-    r.raise_for_status()
-    return r.json()
-
-
-def search_products(query: str, page_size=5, fields=None, lang="ru", country="ru") -> dict:
-    """
-    Поиск продуктов по тексту (Search API v2).
-    """
-    if fields is None:
-        fields = "code,product_name,brands,nutriments,quantity,serving_size,ecoscore_grade"
-
-    url = f"{BASE}/api/v2/search"
-    params = {
-        "search_terms": query,
-        "fields": fields,
-        "page_size": page_size,
-        "lc": lang,
-        "cc": country,
-    }
-
-    r = requests.get(url, headers=HEADERS, params=params, timeout=20)
-    r.raise_for_status()
-    return r.json()
-
-
-def extract_kcal(nutriments: dict) -> dict:
-    """
-    Извлекает калорийность и БЖУ.
-    Возвращает значения на 100 г и на порцию (если доступно).
-    """
-    get = nutriments.get
-    data = {
-        "kcal_100g": get("energy-kcal_100g") or get("energy-kcal_value"),
-        "protein_100g": get("proteins_100g"),
-        "fat_100g": get("fat_100g"),
-        "carbs_100g": get("carbohydrates_100g"),
-        "kcal_serving": get("energy-kcal_serving"),
-        "protein_serving": get("proteins_serving"),
-        "fat_serving": get("fat_serving"),
-        "carbs_serving": get("carbohydrates_serving"),
-    }
-    return {k: v for k, v in data.items() if v is not None}
-
-
-def format_product_details(product: dict) -> str:
-    """
-    Формирует текст с информацией о продукте для отображения в интерфейсе.
-    """
-    name = product.get("product_name") or "—"
-    brand = product.get("brands") or "—"
-    code = product.get("code") or "—"
-    quantity = product.get("quantity") or "—"
-    serving = product.get("serving_size") or "—"
-
-    nutr = extract_kcal(product.get("nutriments", {}))
-
-    lines = [
-        f"Название: {name}",
-        f"Бренд: {brand}",
-        f"Штрихкод: {code}",
-        f"Упаковка: {quantity}",
-        f"Порция: {serving}",
-        "",
-        "Питательные вещества:"
-    ]
-
-    if not nutr:
-        lines.append("  данные о БЖУ не найдены")
-    else:
-        if "kcal_100g" in nutr:
-            lines.append(f"  Калории на 100 г: {nutr['kcal_100g']}")
-        if "protein_100g" in nutr:
-            lines.append(f"  Белок на 100 г: {nutr['protein_100g']}")
-        if "fat_100g" in nutr:
-            lines.append(f"  Жиры на 100 г: {nutr['fat_100g']}")
-        if "carbs_100g" in nutr:
-            lines.append(f"  Углеводы на 100 г: {nutr['carbs_100g']}")
-
-        if any(k.endswith("_serving") for k in nutr.keys()):
-            lines.append("")
-            lines.append("На порцию:")
-            if "kcal_serving" in nutr:
-                lines.append(f"  Калории на порцию: {nutr['kcal_serving']}")
-            if "protein_serving" in nutr:
-                lines.append(f"  Белок на порцию: {nutr['protein_serving']}")
-            if "fat_serving" in nutr:
-                lines.append(f"  Жиры на порцию: {nutr['fat_serving']}")
-            if "carbs_serving" in nutr:
-                lines.append(f"  Углеводы на порцию: {nutr['carbs_serving']}")
-
-    return "\n".join(lines)
-
-
-class MainWindow(QWidget):
-    def __init__(self):
-        super().__init__()
-
-        self.setWindowTitle("Поиск калорийности продуктов")
-        self.resize(800, 600)
-
-        # Простые стили
-        self.setStyleSheet("""
-            QWidget {
-                font-family: Arial;
-                font-size: 12px;
-            }
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                border: none;
-                padding: 8px 15px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #45a049;
-            }
-            QTableWidget {
-                border: 1px solid #ccc;
-            }
-            QHeaderView::section {
-                background-color: #f0f0f0;
-                padding: 5px;
-                font-weight: bold;
-            }
-            QTextEdit {
-                border: 1px solid #ccc;
-                background-color: #f9f9f9;
-            }
-        """)
-
-        self.current_products = []
-
-        main_layout = QVBoxLayout()
-        main_layout.setSpacing(10)
-        self.setLayout(main_layout)
-
-        # --- Панель поиска ---
-        search_layout = QHBoxLayout()
-
-        self.mode_combo = QComboBox()
-        self.mode_combo.addItems(["По штрихкоду", "По названию"])
-        self.mode_combo.currentIndexChanged.connect(self.on_mode_changed)
-
-        self.query_edit = QLineEdit()
-        self.query_edit.setPlaceholderText("Введите штрихкод или название продукта")
-
-        self.search_button = QPushButton("Найти")
-        self.search_button.clicked.connect(self.on_search_clicked)
-
-        search_layout.addWidget(QLabel("Режим:"))
-        search_layout.addWidget(self.mode_combo)
-        search_layout.addWidget(self.query_edit)
-        search_layout.addWidget(self.search_button)
-
-        main_layout.addLayout(search_layout)
-
-        # --- Таблица результатов ---
-        main_layout.addWidget(QLabel("Результаты поиска:"))
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Штрихкод", "Название", "Бренд", "Ккал/100г"])
-        self.table.cellDoubleClicked.connect(self.on_table_double_clicked)
-        self.table.hide()
-
-        main_layout.addWidget(self.table)
-
-        # --- Детальная информация ---
-        main_layout.addWidget(QLabel("Информация о продукте:"))
-        self.details_text = QTextEdit()
-        self.details_text.setReadOnly(True)
-        main_layout.addWidget(self.details_text)
-
-        self.on_mode_changed(0)
-
-    def on_mode_changed(self, index: int):
-        mode = self.mode_combo.currentText()
-        self.details_text.clear()
-        self.table.clearContents()
-        self.table.setRowCount(0)
-
-        if mode == "По штрихкоду":
-            self.table.hide()
-            self.query_edit.setPlaceholderText("Введите штрихкод (например 5449000000996)")
-        else:
-            self.table.show()
-            self.query_edit.setPlaceholderText("Введите название (например 'творог 5%')")
-
-    def on_search_clicked(self):
-        query = self.query_edit.text().strip()
-        if not query:
-            QMessageBox.warning(self, "Ошибка", "Введите запрос.")
-            return
-
-        mode = self.mode_combo.currentText()
-
-        try:
-            if mode == "По штрихкоду":
-                self.search_by_barcode(query)
-            else:
-                self.search_by_name(query)
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Ошибка сети", f"Не удалось выполнить запрос:\n{e}")
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Произошла ошибка:\n{e}")
-
-    def search_by_barcode(self, barcode: str):
-        self.details_text.clear()
-        self.table.clearContents()
-        self.table.setRowCount(0)
-
-        data = get_product_by_barcode(barcode)
-        product = data.get("product")
-
-        if not product:
-            QMessageBox.information(self, "Результат", "Продукт не найден.")
-            return
-
-        details = format_product_details(product)
-        self.details_text.setPlainText(details)
-
-    def search_by_name(self, name: str):
-        self.details_text.clear()
-        self.table.clearContents()
-        self.table.setRowCount(0)
-        self.current_products = []
-
-        data = search_products(name, page_size=10)
-        products = data.get("products", [])
-
-        if not products:
-            QMessageBox.information(self, "Результат", "Ничего не найдено.")
-            return
-
-        self.current_products = products
-        self.table.setRowCount(len(products))
-
-        for row, p in enumerate(products):
-            code = p.get("code") or ""
-            name = p.get("product_name") or ""
-            brand = p.get("brands") or ""
-            nutr = extract_kcal(p.get("nutriments", {}))
-            kcal_100g = nutr.get("kcal_100g", "")
-
-            self.table.setItem(row, 0, QTableWidgetItem(code))
-            self.table.setItem(row, 1, QTableWidgetItem(name))
-            self.table.setItem(row, 2, QTableWidgetItem(brand))
-            self.table.setItem(row, 3, QTableWidgetItem(str(kcal_100g)))
-
-        self.table.resizeColumnsToContents()
-
-    def on_table_double_clicked(self, row: int, column: int):
-        if 0 <= row < len(self.current_products):
-            product = self.current_products[row]
-            details = format_product_details(product)
-            self.details_text.setPlainText(details)
-
-
-def main():
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
-    sys.exit(app.exec())
-
-
-if __name__ == "__main__":
+# file: off_gui.py
+import sys
+from datetime import timedelta
+from functools import lru_cache
+from pathlib import Path
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+from urllib3.util.retry import Retry
+
+from PyQt6.QtCore import (
+    QAbstractTableModel,
+    QModelIndex,
+    QObject,
+    QRunnable,
+    Qt,
+    QThreadPool,
+    QTimer,
+    pyqtSignal,
+)
+from PyQt6.QtWidgets import (
+    QApplication,
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QComboBox,
+    QHeaderView,
+    QTableView,
+    QTextEdit,
+    QMessageBox,
+)
+
+BASE = "https://world.openfoodfacts.org"
+
+# Простые стили, применяются ко всему приложению в main()
+STYLE_PATH = Path(__file__).with_name("style.qss")
+
+HEADERS = {
+    "User-Agent": "Darcons-Trade-CalorieFetcher/1.0 (+https://darcons-trade.example)"
+}
+
+# Общая сессия: keep-alive и пул соединений к одному хосту OFF,
+# ответы сохраняются в SQLite и переживают перезапуск приложения
+_SESSION = CachedSession(
+    cache_name=str(Path.home() / ".cache" / "off_gui" / "http"),
+    backend="sqlite",
+    expire_after=timedelta(hours=24),
+    allowable_codes=(200,),
+)
+_SESSION.headers.update(HEADERS)
+# Повтор с экспоненциальной задержкой при ограничении частоты (429) и сбоях сервера
+_SESSION.mount("https://", HTTPAdapter(
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+    ),
+    pool_connections=4,
+    pool_maxsize=8,
+))
+
+# Только поля, которые отображает интерфейс; из nutriments — ключи, читаемые extract_kcal
+FIELDS = ",".join((
+    "code",
+    "product_name",
+    "brands",
+    "quantity",
+    "serving_size",
+    "nutriments.energy-kcal_100g",
+    "nutriments.energy-kcal_value",
+    "nutriments.energy-kcal_serving",
+    "nutriments.proteins_100g",
+    "nutriments.proteins_serving",
+    "nutriments.fat_100g",
+    "nutriments.fat_serving",
+    "nutriments.carbohydrates_100g",
+    "nutriments.carbohydrates_serving",
+))
+
+# Ограничение OFF на page_size, а значит и на число штрихкодов в get_products_by_barcodes
+MAX_BARCODES = 100
+
+
+def get_session() -> requests.Session:
+    """
+    Возвращает общую HTTP-сессию, через которую идут все запросы к API.
+    """
+    return _SESSION
+
+
+def get_product_by_barcode(barcode: str, fields=None, lang="ru", country="ru") -> dict:
+    """
+    Получение конкретного продукта по штрихкоду (API v2).
+    """
+    if fields is None:
+        fields = FIELDS
+
+    return _get_product_cached(barcode, fields, lang, country)
+
+
+@lru_cache(maxsize=256)
+def _get_product_cached(barcode: str, fields: str, lang: str, country: str) -> dict:
+    url = f"{BASE}/api/v2/product/{barcode}"
+    params = {"fields": fields, "lc": lang, "cc": country}
+
+    r = _SESSION.get(url, params=params, timeout=20)
+    r.raise_for_status()
+    return orjson.loads(r.content)
+
+
+def search_products(query: str, page_size=5, fields=None, lang="ru", country="ru") -> dict:
+    """
+    Поиск продуктов по тексту (Search API v2).
+    """
+    if fields is None:
+        fields = FIELDS
+
+    return _search_products_cached(query, page_size, fields, lang, country)
+
+
+@lru_cache(maxsize=256)
+def _search_products_cached(query: str, page_size: int, fields: str, lang: str, country: str) -> dict:
+    url = f"{BASE}/api/v2/search"
+    params = {
+        "search_terms": query,
+        "fields": fields,
+        "page_size": page_size,
+        "lc": lang,
+        "cc": country,
+    }
+
+    r = _SESSION.get(url, params=params, timeout=20)
+    r.raise_for_status()
+    return orjson.loads(r.content)
+
+
+def get_products_by_barcodes(barcodes: list, fields=None, lang="ru", country="ru") -> list:
+    """
+    Получение нескольких продуктов по штрихкодам одним запросом (Search API v2).
+    """
+    if not barcodes:
+        return []
+    if len(barcodes) > MAX_BARCODES:
+        raise ValueError(f"Не более {MAX_BARCODES} штрихкодов за один запрос, передано {len(barcodes)}")
+    if fields is None:
+        fields = FIELDS
+
+    # Копия: вызывающий код не должен менять закэшированный ответ
+    return list(_get_products_cached(tuple(barcodes), fields, lang, country))
+
+
+@lru_cache(maxsize=256)
+def _get_products_cached(barcodes: tuple, fields: str, lang: str, country: str) -> tuple:
+    url = f"{BASE}/api/v2/search"
+    params = {
+        "code": ",".join(barcodes),
+        "fields": fields,
+        "page_size": len(barcodes),
+        "lc": lang,
+        "cc": country,
+    }
+
+    r = _SESSION.get(url, params=params, timeout=20)
+    r.raise_for_status()
+    return tuple(orjson.loads(r.content).get("products", []))
+
+
+# Ключи результата extract_kcal и источники в nutriments (по порядку приоритета)
+_NUTR_MAP = (
+    ("kcal_100g", ("energy-kcal_100g", "energy-kcal_value")),
+    ("protein_100g", ("proteins_100g",)),
+    ("fat_100g", ("fat_100g",)),
+    ("carbs_100g", ("carbohydrates_100g",)),
+    ("kcal_serving", ("energy-kcal_serving",)),
+    ("protein_serving", ("proteins_serving",)),
+    ("fat_serving", ("fat_serving",)),
+    ("carbs_serving", ("carbohydrates_serving",)),
+)
+
+
+def extract_kcal(nutriments: dict) -> dict:
+    """
+    Извлекает калорийность и БЖУ.
+    Возвращает значения на 100 г и на порцию (если доступно).
+    """
+    get = nutriments.get
+    data = {}
+    for out, srcs in _NUTR_MAP:
+        for k in srcs:
+            v = get(k)
+            if v is not None:
+                data[out] = v
+                break
+    return data
+
+
+# Подписи показателей в format_product_details: (ключ extract_kcal, подпись)
+_P100 = (
+    ("kcal_100g", "Калории на 100 г"),
+    ("protein_100g", "Белок на 100 г"),
+    ("fat_100g", "Жиры на 100 г"),
+    ("carbs_100g", "Углеводы на 100 г"),
+)
+_PSRV = (
+    ("kcal_serving", "Калории на порцию"),
+    ("protein_serving", "Белок на порцию"),
+    ("fat_serving", "Жиры на порцию"),
+    ("carbs_serving", "Углеводы на порцию"),
+)
+
+_HEADER_FMT = (
+    "Название: {name}\n"
+    "Бренд: {brand}\n"
+    "Штрихкод: {code}\n"
+    "Упаковка: {quantity}\n"
+    "Порция: {serving}\n"
+    "\n"
+    "Питательные вещества:"
+)
+
+
+def format_product_details(product: dict, nutr=None) -> str:
+    """
+    Формирует текст с информацией о продукте для отображения в интерфейсе.
+    nutr — уже извлечённый extract_kcal словарь, если он есть.
+    """
+    get = product.get
+    header = _HEADER_FMT.format(
+        name=get("product_name") or "—",
+        brand=get("brands") or "—",
+        code=get("code") or "—",
+        quantity=get("quantity") or "—",
+        serving=get("serving_size") or "—",
+    )
+
+    if nutr is None:
+        nutr = extract_kcal(get("nutriments", {}))
+
+    if not nutr:
+        return header + "\n  данные о БЖУ не найдены"
+
+    lines = [f"  {lbl}: {nutr[k]}" for k, lbl in _P100 if k in nutr]
+
+    if any(k in nutr for k, _ in _PSRV):
+        lines.append("")
+        lines.append("На порцию:")
+        lines.extend(f"  {lbl}: {nutr[k]}" for k, lbl in _PSRV if k in nutr)
+
+    return header + "\n" + "\n".join(lines)
+
+
+class WorkerSignals(QObject):
+    """
+    Сигналы фонового запроса: номер запроса и результат или исключение.
+    """
+    finished = pyqtSignal(int, dict)
+    error = pyqtSignal(int, Exception)
+
+
+class FetchWorker(QRunnable):
+    """
+    Выполняет запрос к API в пуле потоков, чтобы не блокировать интерфейс.
+    Отменённый (abort) запрос не отправляет сигналов.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.token = 0
+        self.abort = False
+
+    def run(self):
+        if self.abort:
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            if not self.abort:
+                self.signals.error.emit(self.token, e)
+        else:
+            if not self.abort:
+                self.signals.finished.emit(self.token, result)
+
+
+class ProductsModel(QAbstractTableModel):
+    """
+    Модель таблицы результатов поиска: читает ячейки прямо из списка продуктов.
+    """
+    COLS = ("code", "product_name", "brands")
+    HEADERS = ("Штрихкод", "Название", "Бренд", "Ккал/100г")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._products = []
+        self._nutr = []
+
+    def set_products(self, products: list, nutr: list):
+        self.beginResetModel()
+        self._products = products
+        self._nutr = nutr
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._products)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+
+        p = self._products[index.row()]
+        col = index.column()
+        if col < len(self.COLS):
+            return p.get(self.COLS[col]) or ""
+        # Число, а не строка: Qt форматирует его сам при отрисовке
+        kcal = self._kcal(index.row())
+        return "" if kcal is None else kcal
+
+    def _kcal(self, row: int):
+        try:
+            return float(self._nutr[row]["kcal_100g"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if column < 0 or not self._products:
+            return
+
+        reverse = order == Qt.SortOrder.DescendingOrder
+        if column < len(self.COLS):
+            key = self.COLS[column]
+            rows = sorted(
+                range(len(self._products)),
+                key=lambda i: (self._products[i].get(key) or "").lower(),
+                reverse=reverse,
+            )
+        else:
+            # Продукты без калорийности всегда в конце
+            known = [i for i in range(len(self._products)) if self._kcal(i) is not None]
+            unknown = [i for i in range(len(self._products)) if self._kcal(i) is None]
+            rows = sorted(known, key=self._kcal, reverse=reverse) + unknown
+
+        # Списки переупорядочиваются на месте: окно держит ссылки на них же
+        self.layoutAboutToBeChanged.emit()
+        self._products[:] = [self._products[i] for i in rows]
+        self._nutr[:] = [self._nutr[i] for i in rows]
+        self.layoutChanged.emit()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        # Вертикальный заголовок (номера строк) и прочие роли — как в базовой модели
+        return super().headerData(section, orientation, role)
+
+
+class MainWindow(QWidget):
+    def __init__(self):
+        super().__init__()
+
+        self.setWindowTitle("Поиск калорийности продуктов")
+        self.resize(800, 600)
+
+        self.current_products = []
+        self._nutr_cache = []
+        self._req_seq = 0
+        self._inflight_worker = None
+        # False для поиска по таймеру: сообщения идут в details_text, а не в диалоги
+        self._interactive = True
+
+        # Отложенный поиск при наборе текста (режим "По названию")
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.timeout.connect(self.on_search_timeout)
+
+        main_layout = QVBoxLayout()
+        main_layout.setSpacing(10)
+        self.setLayout(main_layout)
+
+        # --- Панель поиска ---
+        search_layout = QHBoxLayout()
+
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(["По штрихкоду", "По названию"])
+        self.mode_combo.currentIndexChanged.connect(self.on_mode_changed)
+
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Введите штрихкод или название продукта")
+        self.query_edit.textChanged.connect(self.on_query_changed)
+
+        self.search_button = QPushButton("Найти")
+        self.search_button.clicked.connect(self.on_search_clicked)
+
+        search_layout.addWidget(QLabel("Режим:"))
+        search_layout.addWidget(self.mode_combo)
+        search_layout.addWidget(self.query_edit)
+        search_layout.addWidget(self.search_button)
+
+        main_layout.addLayout(search_layout)
+
+        # --- Таблица результатов ---
+        main_layout.addWidget(QLabel("Результаты поиска:"))
+        self.table = QTableView()
+        self.model = ProductsModel(self)
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.table.doubleClicked.connect(self.on_table_double_clicked)
+        self.table.hide()
+
+        main_layout.addWidget(self.table)
+
+        # --- Детальная информация ---
+        main_layout.addWidget(QLabel("Информация о продукте:"))
+        self.details_text = QTextEdit()
+        self.details_text.setReadOnly(True)
+        main_layout.addWidget(self.details_text)
+
+        self.on_mode_changed(0)
+
+    def on_mode_changed(self, index: int):
+        mode = self.mode_combo.currentText()
+        self._search_timer.stop()
+        self._cancel_inflight()
+        self.details_text.clear()
+        self.model.set_products([], [])
+
+        if mode == "По штрихкоду":
+            self.table.hide()
+            self.query_edit.setPlaceholderText("Введите штрихкод (например 5449000000996)")
+        else:
+            self.table.show()
+            self.query_edit.setPlaceholderText("Введите название (например 'творог 5%')")
+
+    def on_query_changed(self, text: str):
+        if self.mode_combo.currentText() == "По названию" and text.strip():
+            self._search_timer.start(250)
+        else:
+            self._search_timer.stop()
+
+    def on_search_clicked(self):
+        self._search_timer.stop()
+        query = self.query_edit.text().strip()
+        if not query:
+            QMessageBox.warning(self, "Ошибка", "Введите запрос.")
+            return
+
+        self._interactive = True
+        self._run_search(query)
+
+    def on_search_timeout(self):
+        query = self.query_edit.text().strip()
+        if not query:
+            return
+
+        self._interactive = False
+        self._run_search(query)
+
+    def _run_search(self, query: str):
+        mode = self.mode_combo.currentText()
+
+        if mode == "По штрихкоду":
+            self.search_by_barcode(query)
+        else:
+            self.search_by_name(query)
+
+    def _notify(self, title: str, text: str, error: bool = False):
+        if not self._interactive:
+            self.details_text.setPlainText(text)
+        elif error:
+            QMessageBox.critical(self, title, text)
+        else:
+            QMessageBox.information(self, title, text)
+
+    def _cancel_inflight(self):
+        # Ответы на запросы с устаревшим номером отбрасываются в слотах
+        self._req_seq += 1
+        if self._inflight_worker is not None:
+            self._inflight_worker.abort = True
+            self._inflight_worker = None
+        self.search_button.setEnabled(True)
+
+    def _start_worker(self, worker: FetchWorker):
+        self._cancel_inflight()
+        worker.token = self._req_seq
+        self._inflight_worker = worker
+        self.search_button.setEnabled(False)
+        worker.signals.error.connect(self._on_fetch_error)
+        QThreadPool.globalInstance().start(worker)
+
+    def _finish_worker(self, token: int) -> bool:
+        if token != self._req_seq:
+            return False
+        self._inflight_worker = None
+        self.search_button.setEnabled(True)
+        return True
+
+    def _on_fetch_error(self, token: int, e: Exception):
+        if not self._finish_worker(token):
+            return
+        if isinstance(e, requests.exceptions.RequestException):
+            self._notify("Ошибка сети", f"Не удалось выполнить запрос:\n{e}", error=True)
+        else:
+            self._notify("Ошибка", f"Произошла ошибка:\n{e}", error=True)
+
+    def search_by_barcode(self, barcode: str):
+        self.details_text.clear()
+        self.model.set_products([], [])
+
+        worker = FetchWorker(get_product_by_barcode, barcode)
+        worker.signals.finished.connect(self._on_barcode_result)
+        self._start_worker(worker)
+
+    def _on_barcode_result(self, token: int, data: dict):
+        if not self._finish_worker(token):
+            return
+        product = data.get("product")
+
+        if not product:
+            self._notify("Результат", "Продукт не найден.")
+            return
+
+        details = format_product_details(product)
+        self.details_text.setPlainText(details)
+
+    def search_by_name(self, name: str):
+        self.details_text.clear()
+        self.current_products = []
+        self._nutr_cache = []
+        self.model.set_products(self.current_products, self._nutr_cache)
+
+        worker = FetchWorker(search_products, name, page_size=10)
+        worker.signals.finished.connect(self._on_search_result)
+        self._start_worker(worker)
+
+    def _on_search_result(self, token: int, data: dict):
+        if not self._finish_worker(token):
+            return
+        products = data.get("products", [])
+
+        if not products:
+            self._notify("Результат", "Ничего не найдено.")
+            return
+
+        # Копия: сортировка таблицы не должна менять закэшированный ответ
+        self.current_products = list(products)
+        self._nutr_cache = [extract_kcal(p.get("nutriments", {})) for p in products]
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.model.set_products(self.current_products, self._nutr_cache)
+
+    def on_table_double_clicked(self, index: QModelIndex):
+        row = index.row()
+        if 0 <= row < len(self.current_products):
+            product = self.current_products[row]
+            details = format_product_details(product, self._nutr_cache[row])
+            self.details_text.setPlainText(details)
+
+
+def main():
+    app = QApplication(sys.argv)
+    app.setStyleSheet(STYLE_PATH.read_text(encoding="utf-8"))
+    window = MainWindow()
+    window.show()
+    sys.exit(app.exec())
+
+
+if __name__ == "__main__":
     main()
\ No newline at end of file